@@ -1,17 +1,282 @@
 import pandas as pd
 import geopandas as gpd
+import pyogrio
+import shapely
+import orjson
+from numba import njit, prange, get_num_threads
 import streamlit as st
 import numpy as np
 import os
+import hashlib
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import tempfile
-from io import StringIO
+from io import BytesIO, StringIO
 from shapely.geometry import Point
 import zipfile
-import base64
 import pydeck as pdk
-import json
 
+ZCTA_URL = "https://www2.census.gov/geo/tiger/TIGER2023/ZCTA520/tl_2023_us_zcta520.zip"
+ZCTA_SHAPEFILE_NAME = "tl_2023_us_zcta520.shp"
+ZCTA_ZIP_PATH = os.path.join(tempfile.gettempdir(), "zcta_2023.zip")
+# Keep each attribute query's IN (...) list well under SQL length limits
+ZCTA_QUERY_BATCH_SIZE = 1000
+# Beyond this many filtered reads, one full read of the archive is faster
+ZCTA_MAX_FILTERED_BATCHES = 3
+# Bound the memory held by st.cache_data, which is shared by all sessions
+CACHE_MAX_ENTRIES = 8
+CACHE_TTL_SECONDS = 60 * 60
+# Smallest share of rows worth a separate per-thread buffer in sum_by_group
+SUM_ROWS_PER_CHUNK = 100_000
+# Degrees; well below what is visible at the map's default zoom
+MAP_SIMPLIFY_TOLERANCE = 0.01
+
+@st.cache_resource(show_spinner=False)
+def get_http_session():
+    """Returns a shared requests session that retries transient server errors."""
+    session = requests.Session()
+    retries = Retry(total=5, backoff_factor=1, status_forcelist=[502, 503, 504])
+    session.mount("https://", HTTPAdapter(max_retries=retries))
+    return session
+
+def download_zcta_zip(url, zip_file_path=ZCTA_ZIP_PATH):
+    """
+    Download the TIGER/Line ZCTA zip to a stable path, reusing an earlier
+    download when the server's ETag has not changed.
+    
+    Returns:
+    --------
+    str
+        Path to the downloaded zip file
+    """
+    etag_path = zip_file_path + ".etag"
+    
+    session = get_http_session()
+    try:
+        head = session.head(url, allow_redirects=True, timeout=60)
+        etag = head.headers.get("ETag", "") if head.ok else ""
+    except requests.RequestException:
+        # Server down or host offline (retries exhausted); fall back to the cache
+        etag = ""
+    
+    if os.path.exists(zip_file_path) and os.path.exists(etag_path):
+        with open(etag_path) as f:
+            cached_etag = f.read()
+        # Keep the cached copy if the server can't tell us otherwise
+        if not etag or cached_etag == etag:
+            return zip_file_path
+    
+    partial_path = zip_file_path + ".part"
+    with session.get(url, stream=True, timeout=60) as response:
+        response.raise_for_status()
+        with open(partial_path, "wb") as f:
+            for chunk in response.iter_content(chunk_size=1 << 20):
+                f.write(chunk)
+    os.replace(partial_path, zip_file_path)
+    
+    with open(etag_path, "w") as f:
+        f.write(etag)
+    
+    return zip_file_path
+
+@st.cache_resource(show_spinner=False)
+def get_zcta_zip(url):
+    """Download the ZCTA zip once per server process and return its path."""
+    return download_zcta_zip(url)
+
+@st.cache_data(show_spinner=False, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS)
+def load_zcta_boundaries(url, zipcodes):
+    """
+    Load only the ZCTA boundaries for the requested ZIP codes.
+
+    For up to a few thousand ZIP codes the filter is pushed down to GDAL as an
+    attribute query, so polygons for ZIP codes not in the input are never
+    decoded. Larger inputs are read in one pass and filtered in pandas.
+
+    Parameters:
+    -----------
+    url : str
+        URL of the TIGER/Line ZCTA zip
+    zipcodes : tuple of str
+        Five-digit ZIP codes to load
+
+    Returns:
+    --------
+    geopandas.GeoDataFrame
+        GeoDataFrame with 'ZCTA5CE20' and 'geometry' columns
+    """
+    zip_file_path = get_zcta_zip(url)
+    shapefile_path = f"/vsizip/{zip_file_path}/{ZCTA_SHAPEFILE_NAME}"
+
+    # Every filtered read rescans the archive, so for large inputs a single
+    # unfiltered pass filtered in pandas is cheaper
+    if len(zipcodes) > ZCTA_QUERY_BATCH_SIZE * ZCTA_MAX_FILTERED_BATCHES:
+        zcta_gdf = pyogrio.read_dataframe(shapefile_path, columns=['ZCTA5CE20'], use_arrow=True)
+        zcta_gdf['ZCTA5CE20'] = zcta_gdf['ZCTA5CE20'].astype(str)
+        return zcta_gdf[zcta_gdf['ZCTA5CE20'].isin(zipcodes)].reset_index(drop=True)
+
+    batches = []
+    for start in range(0, len(zipcodes), ZCTA_QUERY_BATCH_SIZE):
+        batch = zipcodes[start:start + ZCTA_QUERY_BATCH_SIZE]
+        in_list = ", ".join("'" + z.replace("'", "''") + "'" for z in batch)
+        batches.append(pyogrio.read_dataframe(
+            shapefile_path,
+            columns=['ZCTA5CE20'],
+            where=f"ZCTA5CE20 IN ({in_list})",
+            use_arrow=True,
+        ))
+
+    if not batches:
+        return gpd.GeoDataFrame({'ZCTA5CE20': []}, geometry=[], crs='EPSG:4326')
+
+    zcta_gdf = gpd.GeoDataFrame(pd.concat(batches, ignore_index=True), crs=batches[0].crs)
+    zcta_gdf['ZCTA5CE20'] = zcta_gdf['ZCTA5CE20'].astype(str)
+    return zcta_gdf
+
+@njit(parallel=True, cache=True)
+def sum_by_group(codes, values, n_groups):
+    """
+    Sums each column of `values` by integer group code, skipping NaNs.
+    
+    Rows are split into chunks of at least SUM_ROWS_PER_CHUNK rows, up to one
+    per thread, each accumulating into its own (n_groups, n_cols) buffer so no
+    atomic adds are needed. Sums are accumulated in the dtype of `values`.
+    
+    Parameters:
+    -----------
+    codes : numpy.ndarray of int64
+        Group code for each row, in the range [0, n_groups)
+    values : numpy.ndarray of int64 or float64
+        C-contiguous (n_rows, n_cols) array of values to sum
+    n_groups : int
+        Number of distinct groups
+        
+    Returns:
+    --------
+    numpy.ndarray
+        (n_groups, n_cols) array of per-group sums, same dtype as `values`
+    """
+    n_rows, n_cols = values.shape
+    n_chunks = min(get_num_threads(), max(1, n_rows // SUM_ROWS_PER_CHUNK))
+    chunk_size = (n_rows + n_chunks - 1) // n_chunks
+    partial = np.zeros((n_chunks, n_groups, n_cols), dtype=values.dtype)
+    for t in prange(n_chunks):
+        start = t * chunk_size
+        stop = min(start + chunk_size, n_rows)
+        for i in range(start, stop):
+            group = codes[i]
+            for j in range(n_cols):
+                value = values[i, j]
+                if value == value:  # skips NaN; always true for integers
+                    partial[t, group, j] += value
+    return partial.sum(axis=0)
+
+def _sums_as_int64(dtype):
+    """Integer and bool columns are summed exactly as int64, the rest as float64."""
+    return pd.api.types.is_integer_dtype(dtype) or pd.api.types.is_bool_dtype(dtype)
+
+def aggregate_zip_data(df, zipcode_column, groupby_column, include_columns=None):
+    """
+    Clean ZIP codes and aggregate the input to one row per ZIP code.
+    
+    Numeric (and bool) columns are summed, all other columns take their first
+    non-null value, matching df.groupby(zipcode_column).agg(...).
+    
+    Parameters:
+    -----------
+    df : pandas.DataFrame
+        Input DataFrame containing ZIP code data
+    zipcode_column : str
+        Name of the column containing ZIP codes
+    groupby_column : str
+        Name of the column to group by for visualization.
+    include_columns : list of str, optional
+        Additional columns to carry through the aggregation
+        
+    Returns:
+    --------
+    pandas.DataFrame
+        One row per five-digit ZIP code, in order of first appearance
+    """
+    df_clean = df.dropna(subset=[zipcode_column, groupby_column])
+    df_clean = df_clean.assign(**{zipcode_column: df_clean[zipcode_column].astype('string[pyarrow]').str.zfill(5)})
+    
+    # Ensure groupby_column is always included in aggregation
+    columns_to_aggregate = [col for col in include_columns or [] if col != groupby_column]
+    if groupby_column not in columns_to_aggregate:
+        columns_to_aggregate.append(groupby_column)
+    
+    columns_to_aggregate = pd.Index(columns_to_aggregate).drop(zipcode_column, errors='ignore')
+    # True/False flags are summed too; is_numeric_dtype alone misses bool[pyarrow]
+    num_cols = pd.Index([
+        col for col in columns_to_aggregate
+        if pd.api.types.is_numeric_dtype(df_clean[col]) or pd.api.types.is_bool_dtype(df_clean[col])
+    ])
+    other_cols = columns_to_aggregate.difference(num_cols, sort=False)
+    agg_dict = {**{col: 'sum' for col in num_cols}, **{col: 'first' for col in other_cols}}
+            
+    if agg_dict and df_clean[zipcode_column].is_unique:
+        # One row per ZIP already: aggregation would be a no-op. Blank numeric
+        # cells become 0, matching what the groupby sum would produce
+        zip_data = df_clean[[zipcode_column, *agg_dict]].reset_index(drop=True)
+        for col in num_cols:
+            dtype = np.int64 if _sums_as_int64(zip_data[col].dtype) else np.float64
+            zip_data[col] = zip_data[col].to_numpy(dtype=dtype, na_value=0)
+    elif agg_dict:
+        # Group on integer ZIP codes: numeric sums run in a Numba kernel and
+        # pandas only handles the 'first' columns
+        codes, zip_uniques = pd.factorize(df_clean[zipcode_column])
+        zip_data = pd.DataFrame({zipcode_column: zip_uniques})
+        codes = codes.astype(np.int64)
+        # Integer and bool columns are summed exactly in int64 (missing counts
+        # as 0); everything else in float64 with NaNs skipped
+        int_cols = [col for col in num_cols if _sums_as_int64(df_clean[col].dtype)]
+        float_cols = [col for col in num_cols if col not in int_cols]
+        for sum_cols, dtype, na_value in [(int_cols, np.int64, 0), (float_cols, np.float64, np.nan)]:
+            if sum_cols:
+                values = np.ascontiguousarray(df_clean[sum_cols].to_numpy(dtype=dtype, na_value=na_value))
+                sums = sum_by_group(codes, values, len(zip_uniques))
+                for j, col in enumerate(sum_cols):
+                    zip_data[col] = sums[:, j]
+        if len(other_cols):
+            firsts = df_clean[other_cols].groupby(codes).first()
+            for col in other_cols:
+                zip_data[col] = firsts[col].array
+        zip_data = zip_data[[zipcode_column, *agg_dict]]
+    else:
+        key_cols = list(dict.fromkeys([zipcode_column, groupby_column]))
+        zip_data = (
+            df_clean[key_cols]
+            .sort_values(zipcode_column, kind='stable')
+            .drop_duplicates(subset=[zipcode_column], keep='first')
+            .reset_index(drop=True)
+        )
+
+    return zip_data
+
+def _frame_cache_key(frame):
+    """
+    Content hash of a whole (Geo)DataFrame for st.cache_data.
+    
+    The cache is shared by every session, so the key must cover all rows:
+    a partial hash could hand one user another user's results. Geometries
+    are hashed through their WKB.
+    """
+    geometry_name = frame.geometry.name if isinstance(frame, gpd.GeoDataFrame) else None
+    attributes = pd.DataFrame(frame.drop(columns=geometry_name) if geometry_name else frame)
+    digest = hashlib.sha256()
+    digest.update(repr((frame.shape, tuple(frame.columns), tuple(map(str, frame.dtypes)))).encode())
+    digest.update(pd.util.hash_pandas_object(attributes).to_numpy().tobytes())
+    if geometry_name:
+        wkb = shapely.to_wkb(np.asarray(frame.geometry.values), hex=True)
+        digest.update(pd.util.hash_pandas_object(pd.Series(wkb, dtype=object), index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+# Streamlit matches hash_funcs on the exact type, so GeoDataFrame needs its own entry
+FRAME_HASH_FUNCS = {pd.DataFrame: _frame_cache_key, gpd.GeoDataFrame: _frame_cache_key}
+
+@st.cache_data(show_spinner=False, hash_funcs=FRAME_HASH_FUNCS, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS)
 def create_full_geographic_data(df, zipcode_column, groupby_column, include_columns=None):
     """
     Create a GeoDataFrame for all ZIP codes with their geographic boundaries,
@@ -41,24 +306,7 @@ def create_full_geographic_data(df, zipcode_column, groupby_column, include_colu
         st.error(f"Required columns '{zipcode_column}' or '{groupby_column}' not found.")
         st.stop()
     
-    df_clean = df.copy()
-    df_clean = df_clean.dropna(subset=[zipcode_column, groupby_column])
-    df_clean[zipcode_column] = df_clean[zipcode_column].astype(str).str.zfill(5)
-    
-    # Ensure groupby_column is always included in aggregation
-    columns_to_aggregate = [col for col in include_columns if col != groupby_column]
-    if groupby_column not in columns_to_aggregate:
-        columns_to_aggregate.append(groupby_column)
-    
-    agg_dict = {col: 'first' for col in columns_to_aggregate if col != zipcode_column}
-    for col in columns_to_aggregate:
-        if pd.api.types.is_numeric_dtype(df_clean[col]):
-            agg_dict[col] = 'sum'
-            
-    if agg_dict:
-        zip_data = df_clean.groupby(zipcode_column).agg(agg_dict).reset_index()
-    else:
-        zip_data = df_clean[[zipcode_column, groupby_column]].drop_duplicates()
+    zip_data = aggregate_zip_data(df, zipcode_column, groupby_column, include_columns)
 
     st.success(f"Aggregated to {len(zip_data)} unique ZIP codes.")
     
@@ -67,19 +315,10 @@ def create_full_geographic_data(df, zipcode_column, groupby_column, include_colu
     unique_zipcodes = set(zip_data[zipcode_column])
     
     try:
-        url = "https://www2.census.gov/geo/tiger/TIGER2023/ZCTA520/tl_2023_us_zcta520.zip"
         st.info("Downloading TIGER/Line shapefile from U.S. Census Bureau...")
-        response = requests.get(url, stream=True, verify=False)
-        response.raise_for_status()
-
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".zip") as tmp_file:
-            tmp_file.write(response.content)
-            zip_file_path = tmp_file.name
+        zcta_gdf = load_zcta_boundaries(ZCTA_URL, tuple(sorted(unique_zipcodes)))
         
-        zcta_gdf = gpd.read_file(f"zip://{zip_file_path}")
-        os.unlink(zip_file_path)
-        
-        st.success(f"Loaded {len(zcta_gdf)} ZIP code boundaries.")
+        st.success(f"Loaded {len(zcta_gdf)} matching ZIP code boundaries.")
         
     except Exception as e:
         st.error(f"Could not download or process geographic data: {e}")
@@ -87,43 +326,145 @@ def create_full_geographic_data(df, zipcode_column, groupby_column, include_colu
         
     # 3. FILTER AND MERGE
     st.subheader("Merging Data")
-    zip_data_merge = zip_data.copy()
-    zip_data_merge = zip_data_merge.rename(columns={zipcode_column: 'ZCTA5CE20'})
+    zip_data_merge = zip_data.rename(columns={zipcode_column: 'ZCTA5CE20'})
 
-    zcta_gdf['ZCTA5CE20'] = zcta_gdf['ZCTA5CE20'].astype(str)
-    zip_data_merge['ZCTA5CE20'] = zip_data_merge['ZCTA5CE20'].astype(str)
+    zcta_gdf = zcta_gdf.set_index('ZCTA5CE20')
+    # Positional lookup of each ZIP's boundary; -1 where the ZIP has none
+    idx = zcta_gdf.index.get_indexer(zip_data_merge['ZCTA5CE20'].values)
+    st.info(f"Found boundaries for {np.count_nonzero(idx >= 0)} of your ZIP codes.")
 
-    zcta_gdf_filtered = zcta_gdf[zcta_gdf['ZCTA5CE20'].isin(unique_zipcodes)].copy()
-    st.info(f"Found boundaries for {len(zcta_gdf_filtered)} of your ZIP codes.")
-    
-    final_gdf = zip_data_merge.merge(zcta_gdf_filtered, on='ZCTA5CE20', how='left')
-    final_gdf = gpd.GeoDataFrame(final_gdf, geometry='geometry', crs='EPSG:4326')
+    # Attach the geometry column by take instead of merging, so the attribute
+    # columns are used as-is and no key join or reordering happens
+    geometry = zcta_gdf.geometry.values.take(idx, allow_fill=True)
+    final_gdf = gpd.GeoDataFrame(zip_data_merge.reset_index(drop=True), geometry=geometry)
+    final_gdf = final_gdf.set_crs('EPSG:4326', allow_override=True)
     
     st.success(f"Final merged dataset contains {len(final_gdf)} records.")
     
     return final_gdf
 
-def get_binary_file_downloader_html(file_data, file_label, file_name):
-    """Generates a link to download a file."""
-    b64 = base64.b64encode(file_data).decode()
-    href = f'<a href="data:application/octet-stream;base64,{b64}" download="{file_name}">{file_label}</a>'
-    return href
+def dissolve_by_group(geodataframe, by):
+    """
+    Dissolves geometries by a column, summing the numeric columns.
+    
+    Equivalent to geodataframe.dissolve(by=by, aggfunc='sum').reset_index()
+    for numeric attributes, but rows are sorted by integer group code once so
+    each group's geometries are contiguous, and the sums are computed with a
+    single np.bincount per column instead of a per-group pandas reduction.
+    Non-numeric columns other than `by` are dropped.
+    """
+    codes, uniques = pd.factorize(geodataframe[by])
+    valid = codes >= 0
+    codes = codes[valid]
+    geometries = np.asarray(geodataframe.geometry.values)[valid]
+    
+    order = np.argsort(codes, kind='stable')
+    split_points = np.flatnonzero(np.diff(codes[order])) + 1
+    dissolved = [shapely.union_all(group) for group in np.split(geometries[order], split_points)]
+    
+    data = {by: uniques}
+    num_cols = geodataframe.select_dtypes('number').columns.drop(by, errors='ignore')
+    for col in num_cols:
+        values = geodataframe[col].to_numpy(dtype=float, na_value=0)[valid]
+        sums = np.bincount(codes, weights=values, minlength=len(uniques))
+        if pd.api.types.is_integer_dtype(geodataframe[col].dtype):
+            sums = sums.astype(np.int64)
+        data[col] = sums
+    
+    return gpd.GeoDataFrame(data, geometry=dissolved, crs=geodataframe.crs)
+
+def _json_default(obj):
+    """Serializes values orjson doesn't handle natively (pd.NA, timestamps)."""
+    if obj is pd.NA or obj is pd.NaT:
+        return None
+    if isinstance(obj, pd.Timestamp):
+        return obj.isoformat()
+    raise TypeError
 
-def create_zip_file(geodataframe, zip_file_name):
+@st.cache_data(show_spinner=False, hash_funcs=FRAME_HASH_FUNCS, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS)
+def create_geojson_string(geodataframe):
+    """
+    Serializes a GeoDataFrame to a GeoJSON FeatureCollection string.
+    
+    Geometries are encoded in a single vectorized Shapely call and the
+    properties come from one to_dict call, avoiding GeoPandas' per-row
+    iterfeatures path used by to_json().
+    """
+    geometries = shapely.to_geojson(geodataframe.geometry.values)
+    records = geodataframe.drop(columns=geodataframe.geometry.name).to_dict(orient='records')
+    
+    features = []
+    for feature_id, props, geometry in zip(geodataframe.index, records, geometries):
+        features.append(
+            '{"id":' + orjson.dumps(str(feature_id)).decode()
+            + ',"type":"Feature","properties":' + orjson.dumps(props, default=_json_default, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+            + ',"geometry":' + (geometry if geometry is not None else 'null') + '}'
+        )
+    return '{"type":"FeatureCollection","features":[' + ','.join(features) + ']}'
+
+def guess_zip_column(columns):
+    """Returns the first column whose name mentions ZIP codes, or None."""
+    for col in columns:
+        if 'zip' in str(col).lower():
+            return col
+    return None
+
+@st.cache_data(show_spinner=False, hash_funcs=FRAME_HASH_FUNCS, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS)
+def create_csv_string(geodataframe):
+    """Serializes the non-geometry attributes of a GeoDataFrame to CSV."""
+    return geodataframe.drop(columns=geodataframe.geometry.name).to_csv(index=False)
+
+def read_uploaded_csv(file):
+    """
+    Reads a CSV into Arrow-backed columns.
+    
+    The header is read first so a likely ZIP column can be read as text,
+    keeping its leading zeros.
+    
+    Returns:
+    --------
+    tuple of (pandas.DataFrame, str or None)
+        The data and the guessed ZIP code column
+    """
+    header = pd.read_csv(file, nrows=0).columns
+    file.seek(0)
+    zip_col_hint = guess_zip_column(header)
+    df = pd.read_csv(
+        file,
+        engine='pyarrow',
+        dtype_backend='pyarrow',
+        dtype={zip_col_hint: 'string[pyarrow]'} if zip_col_hint else None
+    )
+    return df, zip_col_hint
+
+@st.cache_data(show_spinner=False, hash_funcs=FRAME_HASH_FUNCS, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS)
+def create_flatgeobuf_file(geodataframe):
+    """Creates a single FlatGeobuf file and returns its contents."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        fgb_path = os.path.join(temp_dir, "output.fgb")
+        # The spatial index can't hold NULL geometries, which every ZIP
+        # without a ZCTA boundary (e.g. PO boxes) has
+        pyogrio.write_dataframe(geodataframe, fgb_path, driver="FlatGeobuf", layer_options={"SPATIAL_INDEX": "NO"})
+        
+        with open(fgb_path, 'rb') as f:
+            fgb_content = f.read()
+    return fgb_content
+
+@st.cache_data(show_spinner=False, hash_funcs=FRAME_HASH_FUNCS, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS)
+def create_zip_file(geodataframe):
     """Creates a zip file containing the shapefile components."""
+    buffer = BytesIO()
     with tempfile.TemporaryDirectory() as temp_dir:
         shapefile_path = os.path.join(temp_dir, "output.shp")
-        geodataframe.to_file(shapefile_path)
+        pyogrio.write_dataframe(geodataframe, shapefile_path, driver="ESRI Shapefile")
         
-        zip_path = os.path.join(temp_dir, zip_file_name)
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zf:
-            for file in os.listdir(temp_dir):
-                if file.startswith("output."):
-                    zf.write(os.path.join(temp_dir, file), arcname=file)
-        
-        with open(zip_path, 'rb') as f:
-            zip_content = f.read()
-    return zip_content
+        # Fast compression is plenty for a download button
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as zf:
+            with os.scandir(temp_dir) as entries:
+                for entry in entries:
+                    if entry.name.startswith("output."):
+                        zf.write(entry.path, arcname=entry.name)
+    return buffer.getvalue()
 
 # =========================================================================
 # STREAMLIT APP CODE
@@ -131,20 +472,24 @@ def create_zip_file(geodataframe, zip_file_name):
 
 st.set_page_config(page_title="Geographic File Generator", layout="wide")
 st.title("Geographic File Generator")
-st.markdown("This app converts your ZIP code data into geographic files (Shapefile, GeoJSON) and visualizes the results.")
+st.markdown("This app converts your ZIP code data into geographic files (FlatGeobuf, Shapefile, GeoJSON) and visualizes the results.")
 
 uploaded_file = st.file_uploader("📂 **Upload your CSV file**", type=["csv"])
 
 if uploaded_file:
     try:
-        df = pd.read_csv(uploaded_file)
+        df, zip_col_hint = read_uploaded_csv(uploaded_file)
         st.success("✅ File uploaded successfully!")
         
         st.write("---")
         st.subheader("1. Configure Analysis")
         
         cols = list(df.columns)
-        zip_col = st.selectbox("Select the column containing ZIP codes:", cols)
+        zip_col = st.selectbox(
+            "Select the column containing ZIP codes:",
+            cols,
+            index=cols.index(zip_col_hint) if zip_col_hint else 0
+        )
         
         groupby_col = st.selectbox(
             "Select a column to group/dissolve the ZIP codes by for visualization:", 
@@ -158,7 +503,20 @@ if uploaded_file:
             default=[c for c in cols if c not in [zip_col, groupby_col]]
         )
 
+        output_format = st.radio(
+            "Select the geographic output format:",
+            ["FlatGeobuf (.fgb)", "Shapefile (.zip, legacy)"],
+            horizontal=True
+        )
+
+        # Keep showing results on the reruns triggered by downloads and map
+        # interaction, as long as the configuration hasn't changed since Generate
+        generate_args = (uploaded_file.file_id, zip_col, groupby_col, tuple(metric_cols))
         if st.button("🚀 Generate Geographic Files"):
+            st.session_state['generated_args'] = generate_args
+            st.session_state.pop('sampled_args', None)
+
+        if st.session_state.get('generated_args') == generate_args:
             with st.spinner("Generating files... This may take a moment."):
                 final_gdf = create_full_geographic_data(df, zip_col, groupby_col, metric_cols)
                 
@@ -168,39 +526,59 @@ if uploaded_file:
 
                     st.subheader("2. Download Results (Full Dataset)")
                     
-                    geojson_string = final_gdf.to_json()
-                    csv_string = final_gdf.drop(columns=['geometry']).to_csv(index=False)
-                    zip_file_name = "output_shapefile.zip"
-                    shapefile_zip = create_zip_file(final_gdf, zip_file_name)
+                    if output_format.startswith("Shapefile"):
+                        geo_file_name = "output_shapefile.zip"
+                        geo_file_label = "Download Shapefile (.zip)"
+                        geo_file_mime = "application/zip"
+                        geo_file = create_zip_file(final_gdf)
+                    else:
+                        geo_file_name = "output_data.fgb"
+                        geo_file_label = "Download FlatGeobuf (.fgb)"
+                        geo_file_mime = "application/octet-stream"
+                        geo_file = create_flatgeobuf_file(final_gdf)
 
                     col1, col2, col3 = st.columns(3)
                     with col1:
-                        st.markdown(get_binary_file_downloader_html(shapefile_zip, "Download Shapefile (.zip)", zip_file_name), unsafe_allow_html=True)
-                    with col2:
                         st.download_button(
-                            label="Download GeoJSON (.geojson)",
-                            data=geojson_string,
-                            file_name="output_data.geojson",
-                            mime="application/json"
+                            label=geo_file_label,
+                            data=geo_file,
+                            file_name=geo_file_name,
+                            mime=geo_file_mime
                         )
+                    # GeoJSON and CSV are only serialized once the user asks for them
+                    with col2:
+                        if st.button("Prepare GeoJSON (.geojson)"):
+                            st.session_state['geojson_args'] = generate_args
+                        if st.session_state.get('geojson_args') == generate_args:
+                            st.download_button(
+                                label="Download GeoJSON (.geojson)",
+                                data=create_geojson_string(final_gdf),
+                                file_name="output_data.geojson",
+                                mime="application/json"
+                            )
                     with col3:
-                        st.download_button(
-                            label="Download CSV (.csv)",
-                            data=csv_string,
-                            file_name="output_attributes.csv",
-                            mime="text/csv"
-                        )
+                        if st.button("Prepare CSV (.csv)"):
+                            st.session_state['csv_args'] = generate_args
+                        if st.session_state.get('csv_args') == generate_args:
+                            st.download_button(
+                                label="Download CSV (.csv)",
+                                data=create_csv_string(final_gdf),
+                                file_name="output_attributes.csv",
+                                mime="text/csv"
+                            )
 
                     st.write("---")
                     st.subheader("3. Geographic Visualization (Sampled and Dissolved)")
                     st.markdown(f"This map shows a **dissolved sample** of the ZIP codes to ensure a smooth, interactive experience. The downloadable files above contain the complete, undissolved dataset.")
                     
-                    # Create a sampled GeoDataFrame for visualization only
-                    unique_groups = final_gdf[groupby_col].unique()
-                    if len(unique_groups) > 5:
-                        sampled_groups = np.random.choice(unique_groups, size=5, replace=False)
-                    else:
-                        sampled_groups = unique_groups
+                    # Create a sampled GeoDataFrame for visualization only. The sample is
+                    # drawn once per Generate so reruns keep showing the same groups
+                    if st.session_state.get('sampled_args') != generate_args:
+                        unique_groups = pd.unique(final_gdf[groupby_col].values)
+                        rng = np.random.default_rng()
+                        st.session_state['sampled_groups'] = list(rng.choice(unique_groups, size=min(5, len(unique_groups)), replace=False, shuffle=False))
+                        st.session_state['sampled_args'] = generate_args
+                    sampled_groups = st.session_state['sampled_groups']
                     
                     sampled_gdf = final_gdf[final_gdf[groupby_col].isin(sampled_groups)]
                     
@@ -208,26 +586,27 @@ if uploaded_file:
                     if sampled_gdf.empty:
                          st.warning("No data found for the selected groups to visualize.")
                     else:
-                        visual_gdf = sampled_gdf.dissolve(by=groupby_col, aggfunc='sum')
-                        visual_gdf = visual_gdf.reset_index()
+                        visual_gdf = dissolve_by_group(sampled_gdf, groupby_col)
+                        # Map-only copy; the downloads above keep full-resolution boundaries
+                        visual_gdf['geometry'] = shapely.simplify(visual_gdf.geometry.values, tolerance=MAP_SIMPLIFY_TOLERANCE, preserve_topology=False)
 
                         st.info(f"Visualizing a dissolved sample of the following groups from the `{groupby_col}` column: {', '.join(map(str, sampled_groups))}")
-    
-                        # Corrected: Convert to GeoJSON string, then parse to a dictionary
-                        visual_json_data = json.loads(visual_gdf.to_json())
-                        
+
+                        # Center on the bounding box; no need for exact polygon centroids
+                        center_lon, center_lat = visual_gdf.total_bounds.reshape(2, 2).mean(axis=0)
+
                         st.pydeck_chart(pdk.Deck(
                             map_style='mapbox://styles/mapbox/light-v9',
                             initial_view_state=pdk.ViewState(
-                                latitude=visual_gdf.geometry.centroid.y.mean(),
-                                longitude=visual_gdf.geometry.centroid.x.mean(),
+                                latitude=center_lat,
+                                longitude=center_lon,
                                 zoom=3.5,
                                 pitch=45,
                             ),
                             layers=[
                                 pdk.Layer(
                                     'GeoJsonLayer',
-                                    data=visual_json_data,
+                                    data=visual_gdf,
                                     filled=True,
                                     get_fill_color=[200, 30, 0, 160],
                                     stroked=True,
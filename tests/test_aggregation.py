@@ -0,0 +1,126 @@
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+
+from app import SUM_ROWS_PER_CHUNK, aggregate_zip_data, read_uploaded_csv
+
+
+def baseline_aggregate(df, zipcode_column, groupby_column, include_columns):
+    """The original groupby(...).agg(...) aggregation, for comparison."""
+    df_clean = df.dropna(subset=[zipcode_column, groupby_column]).copy()
+    df_clean[zipcode_column] = df_clean[zipcode_column].astype(str).str.zfill(5)
+
+    columns_to_aggregate = [col for col in include_columns if col != groupby_column]
+    columns_to_aggregate.append(groupby_column)
+    agg_dict = {col: 'first' for col in columns_to_aggregate if col != zipcode_column}
+    for col in columns_to_aggregate:
+        if pd.api.types.is_numeric_dtype(df_clean[col]):
+            agg_dict[col] = 'sum'
+    return df_clean.groupby(zipcode_column).agg(agg_dict).reset_index()
+
+
+def assert_matches_baseline(df, include_columns):
+    result = aggregate_zip_data(df, 'zip', 'region', include_columns)
+    expected = baseline_aggregate(df, 'zip', 'region', include_columns)
+
+    result = result.astype({'zip': str}).sort_values('zip').reset_index(drop=True)
+    expected = expected.astype({'zip': str}).sort_values('zip').reset_index(drop=True)
+    tm.assert_frame_equal(result, expected, check_dtype=False, check_like=True)
+
+
+def make_frame(zips):
+    n = len(zips)
+    return pd.DataFrame({
+        'zip': zips,
+        'region': [f"r{i % 3}" for i in range(n)],
+        'population': np.arange(n, dtype=np.int64) * 1000,
+        'income': [np.nan if i % 4 == 0 else i * 1.5 for i in range(n)],
+        'visits': pd.array([pd.NA if i % 3 == 0 else i for i in range(n)], dtype='Int64'),
+        'is_urban': [i % 2 == 0 for i in range(n)],
+        'label': [None if i % 5 == 0 else f"l{i}" for i in range(n)],
+    })
+
+
+INCLUDE = ['population', 'income', 'visits', 'is_urban', 'label']
+
+
+def test_duplicated_zips_match_baseline():
+    df = make_frame([2134, 2134, 10001, 10001, 10001, 94105, 501, 501])
+    assert_matches_baseline(df, INCLUDE)
+
+
+def test_unique_zips_match_baseline():
+    df = make_frame([2134, 10001, 94105, 501, 60601])
+    assert_matches_baseline(df, INCLUDE)
+
+
+def test_all_nan_group_sums_to_zero():
+    df = pd.DataFrame({
+        'zip': [2134, 2134, 10001],
+        'region': ['a', 'a', 'b'],
+        'income': [np.nan, np.nan, 2.5],
+    })
+    assert_matches_baseline(df, ['income'])
+
+
+def test_bool_columns_are_summed():
+    df = pd.DataFrame({
+        'zip': [2134, 2134, 2134, 10001],
+        'region': ['a', 'a', 'a', 'b'],
+        'is_urban': [True, False, True, True],
+    })
+    result = aggregate_zip_data(df, 'zip', 'region', ['is_urban'])
+    assert result.set_index('zip')['is_urban'].to_dict() == {'02134': 2, '10001': 1}
+
+
+def test_multi_chunk_input_matches_baseline():
+    rng = np.random.default_rng(0)
+    n = 2 * SUM_ROWS_PER_CHUNK + 123
+    df = pd.DataFrame({
+        'zip': rng.integers(501, 1500, size=n),
+        'region': rng.choice(['a', 'b', 'c'], size=n),
+        'population': rng.integers(0, 2**40, size=n),
+        'income': np.where(rng.random(n) < 0.1, np.nan, rng.random(n)),
+    })
+    result = aggregate_zip_data(df, 'zip', 'region', ['population', 'income'])
+    expected = baseline_aggregate(df, 'zip', 'region', ['population', 'income'])
+
+    result = result.astype({'zip': str}).sort_values('zip').reset_index(drop=True)
+    expected = expected.astype({'zip': str}).sort_values('zip').reset_index(drop=True)
+    tm.assert_series_equal(result['population'], expected['population'], check_dtype=False)
+    tm.assert_series_equal(result['income'], expected['income'], check_dtype=False, rtol=1e-9)
+    tm.assert_series_equal(result['region'], expected['region'], check_dtype=False)
+
+
+def test_nothing_to_aggregate_keeps_first_row_per_zip():
+    df = pd.DataFrame({'zip': [10001, 2134, 10001, 2134]})
+    result = aggregate_zip_data(df, 'zip', 'zip', [])
+    assert list(result.columns) == ['zip']
+    assert list(result['zip'].astype(str)) == ['02134', '10001']
+
+
+def test_arrow_csv_bool_and_int_columns_are_summed():
+    csv = BytesIO(b"zip,region,is_urban,population\n02134,a,true,10\n02134,a,false,5\n02134,a,true,1\n10001,b,true,7\n")
+    df, zip_col = read_uploaded_csv(csv)
+    assert zip_col == 'zip'
+    assert str(df['is_urban'].dtype) == 'bool[pyarrow]'
+
+    result = aggregate_zip_data(df, 'zip', 'region', ['is_urban', 'population']).set_index('zip')
+    assert result['is_urban'].to_dict() == {'02134': 2, '10001': 1}
+    assert result['population'].to_dict() == {'02134': 16, '10001': 7}
+
+
+def test_unique_and_duplicated_zips_give_same_dtypes():
+    header = b"zip,region,is_urban,population,income,label\n"
+    unique_csv = BytesIO(header + b"02134,a,true,10,1.5,x\n10001,b,false,7,,y\n")
+    duplicated_csv = BytesIO(header + b"02134,a,true,10,1.5,x\n02134,a,false,5,2.0,x\n10001,b,false,7,,y\n")
+
+    include = ['is_urban', 'population', 'income', 'label']
+    unique = aggregate_zip_data(read_uploaded_csv(unique_csv)[0], 'zip', 'region', include)
+    duplicated = aggregate_zip_data(read_uploaded_csv(duplicated_csv)[0], 'zip', 'region', include)
+
+    tm.assert_series_equal(unique.dtypes, duplicated.dtypes)
+    assert unique['population'].dtype == np.int64
+    assert unique['income'].dtype == np.float64
@@ -0,0 +1,37 @@
+import os
+
+import geopandas as gpd
+import pandas as pd
+import pyogrio
+from shapely.geometry import box
+
+from app import _frame_cache_key, create_flatgeobuf_file
+
+
+def test_flatgeobuf_keeps_unmatched_zip(tmp_path):
+    # '99999' has no ZCTA boundary, so its geometry is NULL after the merge
+    gdf = gpd.GeoDataFrame(
+        {'ZCTA5CE20': ['02134', '99999'], 'count': [3, 1]},
+        geometry=[box(-71.2, 42.3, -71.1, 42.4), None],
+        crs='EPSG:4326',
+    )
+
+    fgb_path = os.path.join(tmp_path, "output.fgb")
+    with open(fgb_path, 'wb') as f:
+        f.write(create_flatgeobuf_file(gdf))
+
+    result = pyogrio.read_dataframe(fgb_path)
+    assert list(result['ZCTA5CE20']) == ['02134', '99999']
+    assert result.geometry.iloc[1] is None
+
+
+def test_cache_key_covers_every_row():
+    df = pd.DataFrame({'zip': [f"{i:05d}" for i in range(2000)], 'count': range(2000)})
+    changed = df.copy()
+    changed.loc[1999, 'count'] = -1
+    assert _frame_cache_key(df) == _frame_cache_key(df.copy())
+    assert _frame_cache_key(df) != _frame_cache_key(changed)
+
+    gdf = gpd.GeoDataFrame(df.iloc[:2], geometry=[box(0, 0, 1, 1), None], crs='EPSG:4326')
+    moved = gdf.set_geometry([box(0, 0, 1, 1), box(1, 1, 2, 2)])
+    assert _frame_cache_key(gdf) != _frame_cache_key(moved)